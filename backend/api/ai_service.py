@@ -3,6 +3,9 @@ AI Service Module - Handles AI model interactions
 """
 import requests
 import logging
+import threading
+from requests.adapters import HTTPAdapter
+from asgiref.sync import sync_to_async
 from django.conf import settings
 
 logger = logging.getLogger(__name__)
@@ -15,6 +18,21 @@ class AIService:
         self.base_url = settings.OLLAMA_BASE_URL
         self.max_tokens = settings.AI_MAX_TOKENS
         self.temperature = settings.AI_TEMPERATURE
+        # Keep-alive connections to Ollama are pooled in one adapter shared by all threads (urllib3
+        # pools are thread-safe); requests.Session is not, so each thread gets its own session on it
+        self._adapter = HTTPAdapter(pool_connections=1, pool_maxsize=50)
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        """This thread's requests.Session, mounted on the shared connection pool"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.mount('http://', self._adapter)
+            session.mount('https://', self._adapter)
+            self._local.session = session
+        return session
     
     def generate_response(self, message, context=None):
         """
@@ -62,7 +80,7 @@ class AIService:
             }
             
             # Make request to Ollama
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/api/chat",
                 json=payload,
                 timeout=30
@@ -72,7 +90,7 @@ class AIService:
                 result = response.json()
                 ai_message = result.get('message', {}).get('content', '')
                 
-                logger.info(f"AI response generated successfully for message: {message[:50]}...")
+                logger.info("AI response generated successfully for message: %.50s...", message)
                 
                 return {
                     'success': True,
@@ -80,7 +98,7 @@ class AIService:
                     'model': self.model_name
                 }
             else:
-                logger.error(f"Ollama API error: {response.status_code} - {response.text}")
+                logger.error("Ollama API error: %s - %s", response.status_code, response.text)
                 return {
                     'success': False,
                     'message': 'I apologize, but I\'m having trouble responding right now. Please try again later.',
@@ -102,7 +120,7 @@ class AIService:
                 'error': 'connection_error'
             }
         except Exception as e:
-            logger.error(f"Unexpected error in AI service: {str(e)}")
+            logger.error("Unexpected error in AI service: %s", e)
             return {
                 'success': False,
                 'message': 'I apologize, but something went wrong. Please try again.',
@@ -117,10 +135,57 @@ class AIService:
             bool: True if service is available, False otherwise
         """
         try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
+            response = self.session.get(f"{self.base_url}/api/tags", timeout=5)
             return response.status_code == 200
         except:
             return False
 
+    def warm_up(self):
+        """
+        Open a pooled connection and load the model into memory ahead of the first chat
+
+        Ollama loads a model without generating anything when sent an empty prompt.
+
+        Returns:
+            bool: True if the model was loaded, False otherwise
+        """
+        if not self.is_available():
+            logger.info("AI warm-up skipped: service not available")
+            return False
+        try:
+            response = self.session.post(
+                f"{self.base_url}/api/generate",
+                json={"model": self.model_name},
+                timeout=120
+            )
+            logger.info("AI warm-up finished with status %s", response.status_code)
+            return response.status_code == 200
+        except Exception as e:
+            logger.warning("AI warm-up failed: %s", e)
+            return False
+
+    def start_warm_up(self):
+        """
+        Run warm_up in a background thread if AI_PREWARM is enabled
+
+        Called from the server entry points (server/asgi.py, server/wsgi.py) so only serving
+        processes warm up, not manage.py commands or tests.
+        """
+        if settings.AI_PREWARM:
+            threading.Thread(target=self.warm_up, name='ai-warm-up', daemon=True).start()
+
+    async def agenerate_response(self, message, context=None):
+        """
+        Async variant of generate_response for async views
+
+        The blocking HTTP call runs in a worker thread so the event loop
+        stays free to serve other requests while waiting on the model.
+        """
+        return await sync_to_async(self.generate_response, thread_sensitive=False)(message, context)
+
+    async def ais_available(self):
+        """Async variant of is_available for async views"""
+        return await sync_to_async(self.is_available, thread_sensitive=False)()
+
 # Global AI service instance
 ai_service = AIService()
@@ -0,0 +1,19 @@
+"""
+Response renderers
+"""
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer that serializes with orjson, which writes UTF-8 directly in native code"""
+
+    # Handles the types orjson doesn't know natively (lazy strings, Decimal, ...) the way DRF does.
+    # Datetimes are passed through to it too: orjson would write UTC as +00:00 where DRF writes Z.
+    _encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return orjson.dumps(data, default=self._encoder.default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME)
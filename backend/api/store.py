@@ -0,0 +1,42 @@
+"""
+Client data store - the 'store' cache alias (Redis when REDIS_URL is set), shared by all worker processes
+"""
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+
+# Holds client data only; throwaway read caches use the default alias so they can't evict it
+cache = ConnectionProxy(caches, 'store')
+
+
+def append(log, item, maxlen):
+    """
+    Append item to a bounded log such as 'chats:<cid>', keeping only the newest maxlen items
+
+    Every item gets its own key, numbered by a counter bumped with incr, which is atomic on
+    every cache backend: concurrent appends from any number of workers are never lost.
+    """
+    seq_key = f'{log}:seq'
+    cache.add(seq_key, 0)
+    n = cache.incr(seq_key)
+    cache.set(f'{log}:{n}', item)
+    if n > maxlen:
+        cache.delete(f'{log}:{n - maxlen}')
+
+
+def tail(log, count):
+    """
+    Return the newest count items of a log, oldest first
+
+    An item whose append is still in flight is skipped rather than waited for.
+    """
+    n = cache.get(f'{log}:seq') or 0
+    keys = [f'{log}:{i}' for i in range(max(1, n - count + 1), n + 1)]
+    if not keys:
+        return []
+    found = cache.get_many(keys)
+    return [found[k] for k in keys if k in found]
+
+
+aappend = sync_to_async(append)
+atail = sync_to_async(tail)
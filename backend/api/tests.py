@@ -1,3 +1,188 @@
-from django.test import TestCase
+import threading
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from . import store
+from .ai_service import ai_service
+from .renderers import ORJSONRenderer
+from .views import MAX_CHAT_BODY_BYTES, contains_sensitive, today_str
+
+
+class StoreTestCase(SimpleTestCase):
+  def setUp(self):
+    cache.clear()
+    store.cache.clear()
+
+
+class AuthTests(StoreTestCase):
+  def setUp(self):
+    super().setUp()
+    self.client.post('/api/auth/register', {'email': 'a@b.com', 'password': 'pw', 'name': 'A'}, content_type='application/json')
+
+  def login(self, email, password):
+    return self.client.post('/api/auth/login', {'email': email, 'password': password}, content_type='application/json')
+
+  def test_login_success(self):
+    r = self.login('a@b.com', 'pw')
+    self.assertEqual(r.status_code, 200)
+    self.assertEqual(r.json()['user'], {'id': 'email:a@b.com', 'email': 'a@b.com', 'name': 'A'})
+
+  def test_password_is_stored_hashed(self):
+    self.assertNotEqual(store.cache.get('user:a@b.com')['password'], 'pw')
+
+  def test_login_wrong_password(self):
+    self.assertEqual(self.login('a@b.com', 'px').status_code, 401)
+
+  def test_login_non_string_password(self):
+    self.assertEqual(self.login('a@b.com', 123).status_code, 400)
+    self.assertEqual(self.login('x@b.com', ['pw']).status_code, 400)
+
+  def test_login_unknown_email_still_hashes(self):
+    # Skipping the hasher for unknown emails would let response time reveal registered accounts
+    with mock.patch('api.views.make_password', wraps=make_password) as hasher:
+      r = self.login('nobody@b.com', 'pw')
+    self.assertEqual(r.status_code, 401)
+    hasher.assert_called_once_with('pw')
+
+  def test_register_duplicate(self):
+    r = self.client.post('/api/auth/register', {'email': 'A@b.com', 'password': 'x'}, content_type='application/json')
+    self.assertEqual(r.status_code, 409)
+
+
+class ContainsSensitiveTests(SimpleTestCase):
+  def test_matches_keywords_in_any_case(self):
+    for text in ('I want to KILL MYSELF', "Don't Want To Live", '我想自杀', '真的活不下去了'):
+      self.assertTrue(contains_sensitive(text), text)
+
+  def test_ignores_other_text(self):
+    for text in ('', None, 'hello', '今天很好', '\u017fuicide'):  # long s must not fold to 's'
+      self.assertFalse(contains_sensitive(text), text)
+
+
+class RendererTests(SimpleTestCase):
+  def render(self, renderer, data):
+    response = Response(data)
+    response.accepted_renderer = renderer
+    response.accepted_media_type = renderer.media_type
+    response.renderer_context = {}
+    return response.render().content
+
+  def test_matches_drf_json_renderer(self):
+    data = {
+      'message': '今天感觉怎么样？',
+      'score': Decimal('3.50'),
+      'at': datetime(2024, 1, 2, 3, 4, 5, 123456, tzinfo=timezone.utc),
+      'day': date(2024, 1, 2),
+      'items': [1, 2.5, None, True],
+      7: 'non-string key',
+    }
+    self.assertEqual(self.render(ORJSONRenderer(), data), self.render(JSONRenderer(), data))
+
+
+class StoreTests(StoreTestCase):
+  def test_tail_of_empty_log(self):
+    self.assertEqual(store.tail('log', 5), [])
+
+  def test_append_keeps_newest_maxlen(self):
+    for i in range(8):
+      store.append('log', i, 5)
+    self.assertEqual(store.tail('log', 10), [3, 4, 5, 6, 7])
+    self.assertEqual(store.tail('log', 2), [6, 7])
+    self.assertIsNone(store.cache.get('log:3'))  # trimmed entries are deleted, not just hidden
+
+  def test_concurrent_appends_are_not_lost(self):
+    def writer(w):
+      for i in range(50):
+        store.append('log', (w, i), 1000)
+    threads = [threading.Thread(target=writer, args=(w,)) for w in range(8)]
+    for t in threads:
+      t.start()
+    for t in threads:
+      t.join()
+    self.assertEqual(len(store.tail('log', 1000)), 400)
+
+  def test_read_caches_are_separate_from_data(self):
+    self.client.post('/api/auth/register', {'email': 'a@b.com', 'password': 'pw'}, content_type='application/json')
+    cache.clear()
+    self.assertIsNotNone(store.cache.get('user:a@b.com'))
+
+
+class ClientDataTests(StoreTestCase):
+  def post(self, path, data):
+    return self.client.post(path, data, content_type='application/json', HTTP_X_CLIENT_ID='c1')
+
+  def get(self, path):
+    return self.client.get(path, HTTP_X_CLIENT_ID='c1')
+
+  def test_one_mood_per_day(self):
+    self.assertEqual(self.post('/api/moods', {'score': 4}).status_code, 200)
+    self.assertEqual(self.post('/api/moods/add', {'score': 2}).status_code, 409)
+    self.assertEqual([r['score'] for r in self.get('/api/moods').json()['data']], [4])
+
+  def test_summary_covers_last_seven_days(self):
+    today = date.fromisoformat(today_str())
+    store.cache.set('moodscores:c1', {(today - timedelta(days=d)).isoformat(): d % 5 + 1 for d in (9, 7, 6, 2)})
+    self.assertEqual(self.get('/api/moods/summary').json()['data'], {'average': 2.5, 'count': 2})
+    self.post('/api/moods', {'score': 5})
+    self.assertEqual(self.get('/api/moods/summary').json()['data'], {'average': 3.33, 'count': 3})
+    self.assertEqual(len(store.cache.get('moodscores:c1')), 3)  # days outside the window are dropped on write
+
+  def test_last_assessment_follows_writes(self):
+    self.assertIsNone(self.get('/api/assessment/last').json()['data'])
+    self.post('/api/assessment/submit', {'answers': [0] * 9})
+    self.post('/api/assessment/submit', {'answers': [3] * 9})
+    self.assertEqual(self.get('/api/assessment/last').json()['data']['total'], 27)
+
+  def read_racing_write(self, path, write):
+    # Performs `write` after the view has loaded its log but before it responds
+    real_tail = store.tail
+
+    def tail_then_write(log, count):
+      items = real_tail(log, count)
+      write()
+      return items
+
+    with mock.patch.object(store, 'tail', side_effect=tail_then_write):
+      return self.get(path).json()['data']
+
+  def test_reads_racing_a_write_are_not_served_stale(self):
+    self.post('/api/assessment/submit', {'answers': [0] * 9})
+    data = self.read_racing_write('/api/assessment/last', lambda: self.post('/api/assessment/submit', {'answers': [3] * 9}))
+    self.assertEqual(data['total'], 0)
+    self.assertEqual(self.get('/api/assessment/last').json()['data']['total'], 27)
+
+    data = self.read_racing_write('/api/chat/history', lambda: store.append('chats:c1', {'message': 'late'}, 50))
+    self.assertEqual(data, [])
+    self.assertEqual(self.get('/api/chat/history').json()['data'], [{'message': 'late'}])
+
+  @mock.patch.object(ai_service, 'generate_response')
+  @mock.patch.object(ai_service, 'is_available', return_value=True)
+  def test_oversized_chat_is_rejected(self, is_available, generate_response):
+    response = self.post('/api/chat', {'message': 'x' * MAX_CHAT_BODY_BYTES})
+    self.assertEqual(response.status_code, 413)
+    is_available.assert_not_called()
+    generate_response.assert_not_called()
+    self.assertEqual(store.tail('chats:c1', 1), [])
+
+  @mock.patch.object(ai_service, 'is_available', return_value=True)
+  def test_chat_history_is_bounded(self, _):
+    contexts = []
+
+    def generate(message, context=None):
+      contexts.append(len(context))
+      return {'success': True, 'message': f're:{message}', 'model': 'test'}
+
+    with mock.patch.object(ai_service, 'generate_response', side_effect=generate):
+      for i in range(55):
+        self.post('/api/chat', {'message': f'm{i}'})
+    history = self.get('/api/chat/history').json()['data']
+    self.assertEqual([h['message'] for h in history], [f'm{i}' for i in range(35, 55)])
+    self.assertEqual(contexts[-1], 20)  # last 10 exchanges, user + assistant each
+    self.assertEqual(len(store.tail('chats:c1', 100)), 50)
@@ -13,6 +13,8 @@ urlpatterns = [
   path('assessment/last', views.assessment_last),
   path('chat', views.chat),
   path('chat/history', views.chat_history),
+  path('survey/sus', views.survey_sus),
+  path('survey/satisfaction', views.survey_satisfaction),
 ]
 
 
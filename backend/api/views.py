@@ -1,33 +1,60 @@
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
+from adrf.decorators import api_view as async_api_view
+from django.contrib.auth.hashers import check_password, make_password
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
 import logging
+import re
+import time
 import uuid
-from collections import defaultdict
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from . import store
 from .ai_service import ai_service
 
 logger = logging.getLogger(__name__)
 
-# In-memory data storage (should use database in production)
-CLIENT_MOODS = defaultdict(list)  # User mood data: client_id -> [{date:'YYYY-MM-DD', score:int, note:str, at: iso}]
-CLIENT_ASSESSMENTS = defaultdict(list)  # User assessment data: client_id -> [{answers:list[int], total:int, level:str, crisis:bool, ai:dict, at: iso}]
-CLIENT_SURVEYS = defaultdict(lambda: { 'sus': [], 'satisfaction': [] })  # User survey data: client_id -> { sus: [answers], satisfaction: [entries] }
-CLIENT_CHATS = defaultdict(list)  # User chat data: client_id -> [{message:str, response:str, at: iso}]
-USERS = {}  # User data: email -> { email, password, name }
-
-
-@api_view(['GET'])
-@permission_classes([AllowAny])
+# Data storage lives in the client data store (see store.py) so all worker processes share it
+# (should use database in production). Keys:
+#   moods:<cid>              User mood data: {'YYYY-MM-DD': {date:'YYYY-MM-DD', score:int, note:str, at: iso}}, oldest day first
+#   mood:<cid>:<date>        Claimed with add so only one request can record a client's day; this also serializes
+#                            the read-modify-write of moods:<cid> and moodscores:<cid>
+#   moodscores:<cid>         Scores within the summary window: {'YYYY-MM-DD': score}, kept small for moods_summary
+#   assessments:<cid>        User assessment log: {answers:list[int], total:int, level:str, crisis:bool, ai:dict, at: iso}
+#   sus:<cid>                User SUS survey log: {answers:list[int], at: iso}
+#   satisfaction:<cid>       User satisfaction survey log: {score:int, comment:str, at: iso}
+#   chats:<cid>              User chat log: {message:str, response:str, at: iso}
+#   user:<email>             User data: { email, password (hashed), name }
+# Logs are written with store.append, which never loses concurrent writes.
+# Per-client history is bounded so long-running servers don't grow without limit
+MAX_MOODS = 60
+MAX_ASSESSMENTS = 100
+MAX_CHATS = 50
+MAX_SURVEYS = 100
+MOOD_CLAIM_TIMEOUT = 2 * 24 * 3600  # seconds; outlives the day it guards
+SUMMARY_DAYS = 7
+MAX_CHAT_BODY_BYTES = 8192  # larger chat requests are rejected before their body is parsed
+
+
+# health, moods_summary and chat_history are plain Django views: they return small dicts and
+# need none of DRF's request wrapping, content negotiation or permission machinery
+
+@require_GET
 def health(request):
   """Health check endpoint - used for service monitoring"""
   logger.info('Health check requested')
-  return Response({'ok': True, 'status': 'healthy'})
+  return JsonResponse({'ok': True, 'status': 'healthy'})
 
 
 def get_client_id(request):
   """Extract client ID from request, supports multiple methods"""
-  cid = request.headers.get('X-Client-Id') or request.GET.get('client_id') or request.POST.get('client_id')
+  # Resolved once per request; only POSTs fall back to the form body, which parses it
+  if hasattr(request, '_cid'):
+    return request._cid
+  cid = request.headers.get('X-Client-Id') or request.GET.get('client_id') or (
+    request.POST.get('client_id') if request.method == 'POST' else None)
+  request._cid = cid
   return cid
 
 
@@ -35,15 +62,22 @@ def get_client_id(request):
 @permission_classes([AllowAny])
 def auth_login(request):
   """User login endpoint - validates email and password"""
-  email = (request.data or {}).get('email')
-  password = (request.data or {}).get('password')
+  payload = request.data or {}
+  email = payload.get('email')
+  password = payload.get('password')
   logger.info('Login attempt email=%s', email)
   if not email or not password:
     return Response({'ok': False, 'message': 'Missing email or password'}, status=400)
+  if not isinstance(password, str):
+    return Response({'ok': False, 'message': 'Password must be a string'}, status=400)
 
   # Validate against registered users if present; otherwise reject
-  user = USERS.get(email)
-  if not user or user.get('password') != password:
+  user = store.cache.get(f'user:{email}')
+  if not user:
+    # Run the hasher anyway so response time doesn't reveal which emails are registered
+    make_password(password)
+    return Response({'ok': False, 'message': 'Email or password incorrect'}, status=401)
+  if not check_password(password, user.get('password')):
     return Response({'ok': False, 'message': 'Email or password incorrect'}, status=401)
 
   client_id = f'email:{email}'
@@ -64,9 +98,9 @@ def auth_register(request):
   name = (payload.get('name') or '').strip() or (email.split('@')[0] if email else '')
   if not email or not password:
     return Response({'ok': False, 'message': 'Email and password required'}, status=400)
-  if email in USERS:
+  # add is atomic, so two workers can't register the same email
+  if not store.cache.add(f'user:{email}', { 'email': email, 'password': make_password(password), 'name': name }):
     return Response({'ok': False, 'message': 'Email already registered'}, status=409)
-  USERS[email] = { 'email': email, 'password': password, 'name': name }
   logger.info('User registered email=%s', email)
   return Response({'ok': True})
 
@@ -81,16 +115,65 @@ def auth_anon(request):
   return Response({'ok': True, 'user': {'id': cid, 'email': 'anon@local', 'name': 'Anonymous'}, 'token': 'anon-token'})
 
 
+_TODAY_CACHE = [float('-inf'), '']  # [monotonic time computed, 'YYYY-MM-DD']
+
+
 def today_str():
-  return datetime.utcnow().date().isoformat()
+  # The date only changes once a day; recompute it at most once per second
+  now = time.monotonic()
+  if now - _TODAY_CACHE[0] > 1.0:
+    _TODAY_CACHE[:] = [now, datetime.utcnow().date().isoformat()]
+  return _TODAY_CACHE[1]
+
+
+def cutoff_str(days):
+  """First date ('YYYY-MM-DD') of the last `days` days, today included"""
+  return (date.fromisoformat(today_str()) - timedelta(days=days - 1)).isoformat()
 
 
 def last_n_days_records(records, days):
+  # records is a date-keyed dict; one entry per day appended as days go by, so it is already sorted
   if not records:
     return []
-  cutoff = datetime.utcnow().date() - timedelta(days=days - 1)
-  filtered = [r for r in records if datetime.fromisoformat(r['date']).date() >= cutoff]
-  return sorted(filtered, key=lambda r: r['date'])
+  # 'YYYY-MM-DD' strings sort the same as the dates they encode, so compare them without parsing
+  cutoff = cutoff_str(days)
+  return [r for r in records.values() if r['date'] >= cutoff]
+
+
+def _moods_get(request, cid):
+  """List the client's moods for the last ?days= days; returns (body, status)"""
+  days = int(request.GET.get('days', '7') or '7')
+  data = last_n_days_records(store.cache.get(f'moods:{cid}'), max(1, min(days, 30)))
+  logger.info('Moods list cid=%s days=%s count=%s', cid, days, len(data))
+  return {'ok': True, 'data': data}, 200
+
+
+def _moods_post(request, cid):
+  """Record today's mood for the client; returns (body, status)"""
+  payload = request.data or {}
+  try:
+    score = int(payload.get('score') or 0)
+  except Exception:
+    return {'ok': False, 'message': '分数必须为整数'}, 400
+  note = (payload.get('note') or '').strip()
+  if score < 1 or score > 5:
+    return {'ok': False, 'message': 'Score must be between 1-5'}, 400
+  t = today_str()
+  if not store.cache.add(f'mood:{cid}:{t}', 1, MOOD_CLAIM_TIMEOUT):
+    return {'ok': False, 'message': 'Already recorded today'}, 409
+  records = store.cache.get(f'moods:{cid}') or {}
+  rec = { 'date': t, 'score': score, 'note': note, 'at': datetime.utcnow().isoformat() }
+  records[t] = rec
+  if len(records) > MAX_MOODS:
+    del records[next(iter(records))]  # drop the oldest day
+  store.cache.set(f'moods:{cid}', records)
+  # Roll the summary window forward: add today's score and drop days that fell out of it
+  cutoff = cutoff_str(SUMMARY_DAYS)
+  scores = {d: s for d, s in (store.cache.get(f'moodscores:{cid}') or {}).items() if d >= cutoff}
+  scores[t] = score
+  store.cache.set(f'moodscores:{cid}', scores)
+  logger.info('Moods add cid=%s score=%s', cid, score)
+  return {'ok': True, 'data': rec}, 200
 
 
 @api_view(['GET'])
@@ -99,10 +182,8 @@ def moods_list(request):
   cid = get_client_id(request)
   if not cid:
     return Response({'ok': False, 'message': 'Missing anonymous ID (X-Client-Id or client_id)'}, status=400)
-  days = int(request.GET.get('days', '7') or '7')
-  data = last_n_days_records(CLIENT_MOODS.get(cid, []), max(1, min(days, 30)))
-  logger.info('Moods list cid=%s days=%s count=%s', cid, days, len(data))
-  return Response({'ok': True, 'data': data})
+  body, status = _moods_get(request, cid)
+  return Response(body, status=status)
 
 
 @api_view(['POST'])
@@ -111,80 +192,46 @@ def moods_add(request):
   cid = get_client_id(request)
   if not cid:
     return Response({'ok': False, 'message': 'Missing anonymous ID (X-Client-Id or client_id)'}, status=400)
-  payload = request.data or {}
-  score = int(payload.get('score') or 0)
-  note = (payload.get('note') or '').strip()
-  if score < 1 or score > 5:
-    return Response({'ok': False, 'message': 'Score must be between 1-5'}, status=400)
-  records = CLIENT_MOODS[cid]
-  t = today_str()
-  if any(r['date'] == t for r in records):
-    return Response({'ok': False, 'message': 'Already recorded today'}, status=409)
-  rec = { 'date': t, 'score': score, 'note': note, 'at': datetime.utcnow().isoformat() }
-  records.append(rec)
-  logger.info('Moods add cid=%s score=%s', cid, score)
-  return Response({'ok': True, 'data': rec})
+  body, status = _moods_post(request, cid)
+  return Response(body, status=status)
 
 
 @api_view(['GET','POST'])
 @permission_classes([AllowAny])
 def moods_root(request):
   # For compatibility with frontend: GET /api/moods and POST /api/moods
-  # Do not delegate to other decorated views to avoid DRF Request/HttpRequest mismatch
-  if request.method == 'GET':
-    cid = get_client_id(request)
-    if not cid:
-      return Response({'ok': False, 'message': 'Missing anonymous ID (X-Client-Id or client_id)'}, status=400)
-    days = int(request.GET.get('days', '7') or '7')
-    data = last_n_days_records(CLIENT_MOODS.get(cid, []), max(1, min(days, 30)))
-    logger.info('Moods list(cid via root) cid=%s days=%s count=%s', cid, days, len(data))
-    return Response({'ok': True, 'data': data})
-
-  # POST
+  # Shares plain helpers with moods_list/moods_add rather than calling those decorated views
   cid = get_client_id(request)
   if not cid:
     return Response({'ok': False, 'message': 'Missing anonymous ID (X-Client-Id or client_id)'}, status=400)
-  payload = request.data or {}
-  try:
-    score = int(payload.get('score') or 0)
-  except Exception:
-    return Response({'ok': False, 'message': '分数必须为整数'}, status=400)
-  note = (payload.get('note') or '').strip()
-  if score < 1 or score > 5:
-    return Response({'ok': False, 'message': 'Score must be between 1-5'}, status=400)
-  records = CLIENT_MOODS[cid]
-  t = today_str()
-  if any(r['date'] == t for r in records):
-    return Response({'ok': False, 'message': 'Already recorded today'}, status=409)
-  rec = { 'date': t, 'score': score, 'note': note, 'at': datetime.utcnow().isoformat() }
-  records.append(rec)
-  logger.info('Moods add(cid via root) cid=%s score=%s', cid, score)
-  return Response({'ok': True, 'data': rec})
+  if request.method == 'GET':
+    body, status = _moods_get(request, cid)
+  else:
+    body, status = _moods_post(request, cid)
+  return Response(body, status=status)
 
 
-@api_view(['GET'])
-@permission_classes([AllowAny])
+@require_GET
 def moods_summary(request):
   cid = get_client_id(request)
   if not cid:
-    return Response({'ok': False, 'message': 'Missing anonymous ID (X-Client-Id or client_id)'}, status=400)
-  recent = last_n_days_records(CLIENT_MOODS.get(cid, []), 7)
+    return JsonResponse({'ok': False, 'message': 'Missing anonymous ID (X-Client-Id or client_id)'}, status=400)
+  # Reads only the small score map, not every record and note; re-filter in case days rolled out since the last write
+  cutoff = cutoff_str(SUMMARY_DAYS)
+  recent = [s for d, s in (store.cache.get(f'moodscores:{cid}') or {}).items() if d >= cutoff]
   count = len(recent)
-  avg = round(sum(r['score'] for r in recent) / count, 2) if count else 0.0
+  avg = round(sum(recent) / count, 2) if count else 0.0
   logger.info('Moods summary cid=%s count=%s avg=%s', cid, count, avg)
-  return Response({'ok': True, 'data': { 'average': avg, 'count': count }})
+  return JsonResponse({'ok': True, 'data': { 'average': avg, 'count': count }})
+
+
+_PHQ9_LEVELS = ('none-minimal', 'mild', 'moderate', 'moderately severe', 'severe')
+# Level index for every possible PHQ-9 total (0-27): bands 0-4, 5-9, 10-14, 15-19, 20-27
+_PHQ9_LEVEL_INDEX = bytes(min(t // 5, 4) for t in range(28))
 
 
 def grade_phq9(total: int) -> str:
-  if total <= 4:
-    return 'none-minimal'
-  if total <= 9:
-    return 'mild'
-  if total <= 14:
-    return 'moderate'
-  if total <= 19:
-    return 'moderately severe'
-  return 'severe'
+  return _PHQ9_LEVELS[_PHQ9_LEVEL_INDEX[total]]
 
 
 @api_view(['POST'])
@@ -198,10 +245,10 @@ def assessment_submit(request):
   if not isinstance(answers, list) or len(answers) != 9:
     return Response({'ok': False, 'message': 'Invalid parameters: should be 9 scores from 0-3'}, status=400)
   try:
-    answers = [int(x) for x in answers]
+    answers = list(map(int, answers))
   except Exception:
     return Response({'ok': False, 'message': 'Invalid parameters: scores must be integers'}, status=400)
-  if any(x < 0 or x > 3 for x in answers):
+  if min(answers) < 0 or max(answers) > 3:
     return Response({'ok': False, 'message': 'Invalid parameters: each score must be 0-3'}, status=400)
   total = sum(answers)
   level = grade_phq9(total)
@@ -218,7 +265,7 @@ def assessment_submit(request):
     },
     'at': datetime.utcnow().isoformat(),
   }
-  CLIENT_ASSESSMENTS[cid].append(record)
+  store.append(f'assessments:{cid}', record, MAX_ASSESSMENTS)
   logger.info('Assessment submit cid=%s total=%s level=%s crisis=%s', cid, total, level, crisis)
   return Response({'ok': True, 'data': {k: record[k] for k in ['total','level','crisis','ai','at']}})
 
@@ -229,27 +276,33 @@ def assessment_last(request):
   cid = get_client_id(request)
   if not cid:
     return Response({'ok': False, 'message': 'Missing anonymous ID (X-Client-Id or client_id)'}, status=400)
-  items = CLIENT_ASSESSMENTS.get(cid, [])
+  items = store.tail(f'assessments:{cid}', 1)
   last = items[-1] if items else None
-  if not last:
-    return Response({'ok': True, 'data': None})
-  return Response({'ok': True, 'data': {k: last[k] for k in ['total','level','crisis','ai','at']}})
+  return Response({'ok': True, 'data': {k: last[k] for k in ['total','level','crisis','ai','at']} if last else None})
+
+
+SENSITIVE_KEYWORDS = (
+  'suicide', "don't want to live", 'kill myself', 'end my life',
+  '不想活', '想自杀', '自杀', '轻生', '寻短见', '活不下去'
+)
+# All keywords compiled into one alternation: a single scan of the message instead of one per keyword.
+# Matched against the lowercased message: re.IGNORECASE disables the engine's literal fast paths,
+# which costs far more than the copy made by str.lower().
+_SENSITIVE_RE = re.compile('|'.join(map(re.escape, SENSITIVE_KEYWORDS)))
 
 
 def contains_sensitive(text: str) -> bool:
   if not text:
     return False
-  t = str(text).lower()
-  keywords = [
-    'suicide', "don't want to live", 'kill myself', 'end my life',
-    '不想活', '想自杀', '自杀', '轻生', '寻短见', '活不下去'
-  ]
-  return any(k in t for k in keywords)
+  return _SENSITIVE_RE.search(str(text).lower()) is not None
 
 
-@api_view(['POST'])
+@async_api_view(['POST'])
 @permission_classes([AllowAny])
-def chat(request):
+async def chat(request):
+  content_length = request.META.get('CONTENT_LENGTH') or ''
+  if content_length.isdigit() and int(content_length) > MAX_CHAT_BODY_BYTES:
+    return Response({'ok': False, 'message': 'Message too long'}, status=413)
   cid = get_client_id(request)
   if not cid:
     return Response({'ok': False, 'message': 'Missing anonymous ID (X-Client-Id or client_id)'}, status=400)
@@ -275,7 +328,7 @@ def chat(request):
     })
 
   # Check if AI service is available
-  if not ai_service.is_available():
+  if not await ai_service.ais_available():
     logger.warning('AI service not available, returning fallback response')
     return Response({
       'ok': True,
@@ -284,14 +337,13 @@ def chat(request):
     })
 
   # Get conversation context from chat history
-  chat_history = CLIENT_CHATS.get(cid, [])
   context = []
-  for chat in chat_history[-10:]:  # Get last 10 messages for context
+  for chat in await store.atail(f'chats:{cid}', 10):  # Get last 10 messages for context
     context.append({"role": "user", "content": chat['message']})
     context.append({"role": "assistant", "content": chat['response']})
 
   # Generate AI response
-  ai_result = ai_service.generate_response(message, context)
+  ai_result = await ai_service.agenerate_response(message, context)
   
   if ai_result['success']:
     # Store conversation in history
@@ -300,11 +352,7 @@ def chat(request):
       'response': ai_result['message'],
       'at': datetime.utcnow().isoformat()
     }
-    CLIENT_CHATS[cid].append(chat_record)
-    
-    # Keep only last 50 messages to prevent memory issues
-    if len(CLIENT_CHATS[cid]) > 50:
-      CLIENT_CHATS[cid] = CLIENT_CHATS[cid][-50:]
+    await store.aappend(f'chats:{cid}', chat_record, MAX_CHATS)
     
     logger.info('Chat response generated successfully for cid=%s', cid)
     return Response({
@@ -322,19 +370,17 @@ def chat(request):
     })
 
 
-@api_view(['GET'])
-@permission_classes([AllowAny])
+@require_GET
 def chat_history(request):
   """Get chat history for a client"""
   cid = get_client_id(request)
   if not cid:
-    return Response({'ok': False, 'message': 'Missing anonymous ID (X-Client-Id or client_id)'}, status=400)
+    return JsonResponse({'ok': False, 'message': 'Missing anonymous ID (X-Client-Id or client_id)'}, status=400)
   
-  chat_history = CLIENT_CHATS.get(cid, [])
-  return Response({
+  return JsonResponse({
     'ok': True,
-    'data': chat_history[-20:]  # Return last 20 messages
-  })
+    'data': store.tail(f'chats:{cid}', 20)  # Return last 20 messages
+  }, json_dumps_params={'ensure_ascii': False})
 
 
 @api_view(['POST'])
@@ -347,12 +393,12 @@ def survey_sus(request):
   if not isinstance(answers, list) or len(answers) != 10:
     return Response({'ok': False, 'message': '参数不合法：需 10 个 1-5 分的数组'}, status=400)
   try:
-    answers = [int(x) for x in answers]
+    answers = list(map(int, answers))
   except Exception:
     return Response({'ok': False, 'message': 'Invalid parameters: scores must be integers'}, status=400)
-  if any(x < 1 or x > 5 for x in answers):
+  if min(answers) < 1 or max(answers) > 5:
     return Response({'ok': False, 'message': '参数不合法：每题分数需在 1-5'}, status=400)
-  CLIENT_SURVEYS[cid]['sus'].append({ 'answers': answers, 'at': datetime.utcnow().isoformat() })
+  store.append(f'sus:{cid}', { 'answers': answers, 'at': datetime.utcnow().isoformat() }, MAX_SURVEYS)
   logger.info('Survey SUS saved cid=%s', cid)
   return Response({ 'ok': True })
 
@@ -371,6 +417,6 @@ def survey_satisfaction(request):
   if score < 1 or score > 5:
     return Response({'ok': False, 'message': '参数不合法：评分必须为 1-5'}, status=400)
   comment = (payload.get('comment') or '').strip()
-  CLIENT_SURVEYS[cid]['satisfaction'].append({ 'score': score, 'comment': comment, 'at': datetime.utcnow().isoformat() })
+  store.append(f'satisfaction:{cid}', { 'score': score, 'comment': comment, 'at': datetime.utcnow().isoformat() }, MAX_SURVEYS)
   logger.info('Survey satisfaction saved cid=%s score=%s', cid, score)
   return Response({ 'ok': True })
@@ -0,0 +1,30 @@
+"""
+Gunicorn configuration - serves the ASGI app with Uvicorn workers
+
+Run from backend/: gunicorn
+Each worker runs an asyncio event loop: async views (chat) wait on the AI service without
+holding the worker, and sync views run in its thread pool.
+Without REDIS_URL every worker would keep its own copy of client data, so only one worker is
+allowed; with it, the default is one worker per CPU.
+"""
+import multiprocessing
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()  # same .env as server/settings.py, so REDIS_URL is seen here too
+
+REDIS_URL = os.getenv('REDIS_URL')
+
+wsgi_app = 'server.asgi:application'
+worker_class = 'uvicorn_worker.UvicornWorker'
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() if REDIS_URL else 1))
+bind = os.getenv('BIND', '0.0.0.0:8000')
+
+
+def on_starting(server):
+    # Checked here rather than above so a -w/--workers command-line override is caught too
+    if server.cfg.workers > 1 and not REDIS_URL:
+        raise RuntimeError(
+            f'{server.cfg.workers} workers need REDIS_URL: without it each worker keeps its own '
+            'users, moods and chats. Set REDIS_URL or run a single worker.')
@@ -0,0 +1,34 @@
+"""
+Logging handlers for the server project.
+"""
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+
+class QueuedConsoleHandler(logging.Handler):
+    """
+    Console handler that writes from a background thread
+
+    Request threads only put records on a queue; a QueueListener thread owns the
+    StreamHandler, so views never wait on its lock or on console I/O.
+
+    This wraps a QueueHandler instead of subclassing it: from Python 3.12 on,
+    dictConfig configures QueueHandler subclasses itself and can't build this one.
+    """
+
+    def __init__(self):
+        super().__init__()
+        records = queue.SimpleQueue()
+        self._queue_handler = QueueHandler(records)
+        self.listener = QueueListener(records, logging.StreamHandler(), respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.listener.stop)  # flush queued records on shutdown
+
+    def setFormatter(self, fmt):
+        super().setFormatter(fmt)
+        self._queue_handler.setFormatter(fmt)  # records are formatted before they are queued
+
+    def emit(self, record):
+        self._queue_handler.emit(record)
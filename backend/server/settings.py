@@ -150,20 +150,57 @@ CSRF_TRUSTED_ORIGINS = [
 SESSION_COOKIE_SAMESITE = 'Lax'
 CSRF_COOKIE_SAMESITE = 'Lax'
 
+# Caches. 'store' holds client data (users, moods, assessments, surveys, chats; see api/store.py) and
+# never expires entries; 'default' is kept separate from it, so anything cached there can't evict data.
+# Set REDIS_URL so every worker process shares the same data; without it each process keeps its own
+# in-memory copy, lost on restart. That copy holds at most STORE_MAX_ENTRIES keys: once full, the least
+# recently used third is evicted, accounts included. When using Redis, configure it not to evict keys
+# (maxmemory-policy noeviction) since it is the only copy of the data.
+REDIS_URL = os.getenv('REDIS_URL')
+STORE_MAX_ENTRIES = 1000000
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'cache',
+        },
+        'store': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'store',
+            'TIMEOUT': None,
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'cache',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        },
+        'store': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'store',
+            'TIMEOUT': None,
+            'OPTIONS': {'MAX_ENTRIES': STORE_MAX_ENTRIES},
+        },
+    }
+
 # Basic REST framework defaults (minimal for now)
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'api.renderers.ORJSONRenderer',
     ],
 }
 
-# Console logging for requests and our app
+# Console logging for requests and our app; records are written by a background thread (see server/log.py)
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
     'handlers': {
         'console': {
-            'class': 'logging.StreamHandler',
+            'class': 'server.log.QueuedConsoleHandler',
         },
     },
     'loggers': {
@@ -185,3 +222,4 @@ OLLAMA_BASE_URL = os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
 AI_MAX_TOKENS = int(os.getenv('AI_MAX_TOKENS', '1000'))
 AI_TEMPERATURE = float(os.getenv('AI_TEMPERATURE', '0.7'))
 AI_MODEL_PROVIDER = os.getenv('AI_MODEL_PROVIDER', 'ollama')
+AI_PREWARM = os.getenv('AI_PREWARM', 'true').lower() == 'true'
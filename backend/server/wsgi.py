@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'server.settings')
 
 application = get_wsgi_application()
+
+# Load the AI model in the background so the first chat doesn't wait for it
+from api.ai_service import ai_service  # noqa: E402 (needs the app registry set up above)
+
+ai_service.start_warm_up()